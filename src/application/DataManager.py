@@ -1,16 +1,34 @@
+from importlib.util import find_spec
 import logging
 from pathlib import Path
+import threading
+from urllib.parse import quote
+import numpy as np
 import pandas as pd
-from sqlalchemy import create_engine, exc
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.pool import StaticPool
 from enum import Enum
 
 from src.application.CustomError import CustomError
 
+# pyarrow is optional, its multithreaded CSV reader is used when installed and pandas' C parser otherwise
+CSV_ENGINE = 'pyarrow' if find_spec('pyarrow') is not None else 'c'
+
+# Database files are read with connectorx's compiled reader if the accel extra is installed
+SQL_READER = 'connectorx' if find_spec('connectorx') is not None else 'sqlalchemy'
+
 class DatasetType(Enum):
     TRAIN = 'train'
     TEST = 'test'
     IDEAL = 'ideal'
 
+# Database table each dataset type is loaded into
+TABLE_NAMES = {
+    DatasetType.TRAIN: 'TrainingData',
+    DatasetType.IDEAL: 'IdealFunctions',
+    DatasetType.TEST: 'TestData',
+}
+
 class DataManager:
     """
     Manages loading data from CSV files into a SQLite database and saving DataFrames to the database.
@@ -18,49 +36,103 @@ class DataManager:
     Attributes:
         dataset_name (str): The name of the dataset to load.
         database_name (str): The base name of the SQLite database file (without extension).
+        database_url (str | None): SQLAlchemy URL of the database, overrides the file derived from dataset_name and
+            database_name (e.g. 'sqlite://' for an in-memory database).
 
     Methods:
-        _create_databases() -> None: Creates and validates the database connection.
-        load_data(dataset_type: DatasetType) -> pd.DataFrame: Loads data from a CSV file into a DataFrame and the corresponding SQLite table).
-        read_data_from_table(table_name: str) -> pd.DataFrame: Reads data from a specified SQLite table into a DataFrame        
+        _create_databases() -> None: Creates the engine and opens the persistent database connection.
+        _write_table(table_name: str, data: pd.DataFrame) -> None: Writes a DataFrame to a SQLite table in a single transaction.
+        load_data_frame(dataset_type: DatasetType) -> pd.DataFrame: Loads data from a CSV file into a DataFrame only.
+        load_data(dataset_type: DatasetType) -> pd.DataFrame: Loads data from a CSV file into a DataFrame and the corresponding SQLite table.
+        read_data_from_table(table_name: str, limit: int | None = None, offset: int = 0) -> pd.DataFrame: Reads data from a specified SQLite table into a DataFrame
         save_data(table_name: str, data: pd.DataFrame) -> None: Saves a DataFrame to a specified SQLite table.
+        close() -> None: Closes the persistent connection and disposes the engine.
     """
 
-    def __init__(self, dataset_name: str, database_name: str):
+    def __init__(self, dataset_name: str, database_name: str, database_url: str | None = None):
         """
         Initializes DataManager with the specified database name.
 
         Args:
             dataset_name (str): The name of the dataset to load.
             database_name (str): The base name for the SQLite database file (e.g., 'my_dataset').
+            database_url (str, optional): SQLAlchemy URL used instead of the database file, e.g. 'sqlite://' for an
+                in-memory database. Defaults to None.
         """
         self.logger = logging.getLogger(__name__)
         self.logger.setLevel('INFO')
         self.dataset_name = dataset_name
         self.database_name = database_name
+        self.database_url = database_url
+        # Parsed CSV files and the tables written from them, both keyed on the modification time of the CSV file
+        self._csv_cache: dict[DatasetType, tuple[int, pd.DataFrame]] = {}
+        self._synced_tables: dict[str, int] = {}
+        # Serializes access to the single shared connection when called from several threads
+        self._lock = threading.Lock()
         self._create_databases()
 
     def _create_databases(self) -> None:
         """
-        Creates and validates the database connection.
+        Creates the engine and opens the persistent database connection.
+
+        The StaticPool keeps a single SQLite connection for the lifetime of the manager instead of reopening the
+        database file on every read or write. This also keeps an in-memory database alive between calls.
 
         Raises:
             Exception: If the database connection fails.
         """
         db_path = Path.cwd() / 'data' / self.dataset_name / f'{self.database_name}.sqlite'
+        # connectorx URL of the database file (percent-encoded POSIX path, also for Windows drive paths), None for a
+        # custom database_url
+        self._connectorx_url = f"sqlite://{quote(db_path.as_posix(), safe='/:')}" if self.database_url is None else None
+        database_url = self.database_url or f'sqlite:///{db_path}'
+        is_new_database = self.database_url is None and not db_path.exists()
         try:
-            self.engine = create_engine(f'sqlite:///{db_path}')
-            with self.engine.connect():
-                self.logger.info(f'Test connection to database: {db_path} successful.')
+            self.engine = create_engine(database_url,
+                                        poolclass=StaticPool,
+                                        connect_args={'check_same_thread': False})
+
+            @event.listens_for(self.engine, 'connect')
+            def _set_sqlite_pragmas(dbapi_connection, _connection_record) -> None:
+                """Tunes each new SQLite connection for bulk loading."""
+                cursor = dbapi_connection.cursor()
+                # The page size only takes effect before the first table is created
+                if is_new_database:
+                    cursor.execute('PRAGMA page_size=16384')
+                cursor.execute('PRAGMA journal_mode=WAL')
+                cursor.execute('PRAGMA synchronous=NORMAL')
+                cursor.execute('PRAGMA temp_store=MEMORY')
+                cursor.execute('PRAGMA cache_size=-64000')
+                cursor.close()
+
+            self._conn = self.engine.connect()
+            self.logger.info(f'Connection to database: {database_url} successful.')
         except exc.SQLAlchemyError as e:
-            raise CustomError(f'Failed to connect to database: {db_path}. Error: {e}') from e
+            raise CustomError(f'Failed to connect to database: {database_url}. Error: {e}') from e
 
-    def load_data(self, dataset_type: DatasetType) -> pd.DataFrame:
+    def _write_table(self, table_name: str, data: pd.DataFrame) -> None:
         """
-        Loads data from a CSV file into a Pandas DataFrame and a SQLite database table.
+        Writes a DataFrame to a SQLite table in a single transaction. Replaces if the table already exists.
+
+        The rows are sent as one prepared INSERT through executemany, which SQLite handles faster than multi-row
+        INSERT statements since the statement is compiled once instead of once per chunk.
+
+        Args:
+            table_name (str): The name of the database table to write to.
+            data (pd.DataFrame): The DataFrame containing the data to be written.
+        """
+        # One transaction for the whole table instead of a commit per row
+        with self._lock, self._conn.begin():
+            data.to_sql(table_name, self._conn, if_exists='replace', index=False)
+
+    def load_data_frame(self, dataset_type: DatasetType) -> pd.DataFrame:
+        """
+        Loads data from a CSV file into a Pandas DataFrame without writing it to the database.
+
+        The parsed DataFrame is cached per dataset type and reused as long as the modification time of the CSV file
+        does not change.
 
         CSV files are expected in the 'data/{database_name}/' directory, named as '{dataset_type.value}.csv' (e.g., data/my_dataset/train.csv).
-        Loads data into tables named "TrainingData", "IdealFunctions", or a table named after dataset_type if it's not TRAIN or IDEAL.
 
         Args:
             dataset_type (DatasetType):  Enum indicating the type of dataset to load (TRAIN, TEST, IDEAL).
@@ -71,36 +143,70 @@ class DataManager:
         Raises:
             FileNotFoundError: If the CSV file is not found.
             pd.errors.ParserError: If there's an error parsing the CSV file.
-            Exception: For other database related errors.
         """
         file_path = Path.cwd() / 'data' / self.dataset_name / f'{dataset_type.value}.csv'
-        table_name = ''
-
-        if dataset_type == DatasetType.TRAIN:
-            table_name = 'TrainingData'
-        elif dataset_type == DatasetType.IDEAL:
-            table_name = 'IdealFunctions'
-        elif dataset_type == DatasetType.TEST:
-            table_name = 'TestData'
 
         try:
-            df = pd.read_csv(file_path)
-            df.to_sql(table_name, self.engine, if_exists='replace', index=False)
+            modified_time = file_path.stat().st_mtime_ns
+            cached = self._csv_cache.get(dataset_type)
+            if cached is not None and cached[0] == modified_time:
+                return cached[1]
+            # All datasets are numeric, so read the header first and parse every column as float64
+            columns = pd.read_csv(file_path, nrows=0).columns
+            dtype = {column: np.float64 for column in columns}
+            if CSV_ENGINE == 'pyarrow':
+                df = pd.read_csv(file_path, dtype=dtype, engine='pyarrow')
+            else:
+                df = pd.read_csv(file_path, dtype=dtype, engine='c', memory_map=True)
+            self._csv_cache[dataset_type] = (modified_time, df)
             return df
         except FileNotFoundError as e:
             raise FileNotFoundError(f'CSV file not found: {file_path}. Error: {e}') from e
         except pd.errors.ParserError as e:
             raise pd.errors.ParserError(f'Error parsing CSV file: {file_path}. Error: {e}') from e
+
+    def load_data(self, dataset_type: DatasetType) -> pd.DataFrame:
+        """
+        Loads data from a CSV file into a Pandas DataFrame and a SQLite database table.
+
+        The table write is skipped while the table still holds the data of the unchanged CSV file.
+        Loads data into the table given by TABLE_NAMES ("TrainingData", "IdealFunctions" or "TestData").
+
+        Args:
+            dataset_type (DatasetType):  Enum indicating the type of dataset to load (TRAIN, TEST, IDEAL).
+
+        Returns:
+            pd.DataFrame: A pandas DataFrame containing the loaded data.
+
+        Raises:
+            FileNotFoundError: If the CSV file is not found.
+            pd.errors.ParserError: If there's an error parsing the CSV file.
+            Exception: For other database related errors.
+        """
+        df = self.load_data_frame(dataset_type)
+        table_name = TABLE_NAMES[dataset_type]
+        modified_time = self._csv_cache[dataset_type][0]
+        if self._synced_tables.get(table_name) == modified_time:
+            return df
+        try:
+            self._write_table(table_name, df)
+            self._synced_tables[table_name] = modified_time
+            return df
         except exc.SQLAlchemyError as e:
             raise CustomError(f'Database error while loading data to table {table_name}: {e}') from e
 
 
-    def read_data_from_table(self, table_name: str) -> pd.DataFrame:
+    def read_data_from_table(self, table_name: str, limit: int | None = None, offset: int = 0) -> pd.DataFrame:
         """
         Reads data from a specified SQLite database table into a Pandas DataFrame.
 
+        With limit or offset only that slice of rows is selected in SQL, the index of the DataFrame starts at offset.
+        Database files are read with connectorx when it is installed, otherwise through the persistent connection.
+
         Args:
             table_name (str): The name of the database table to read from (e.g., "TestDataMapping").
+            limit (int, optional): Maximum number of rows to read. Defaults to None (all rows).
+            offset (int): Number of rows to skip. Defaults to 0.
 
         Returns:
             pd.DataFrame: A pandas DataFrame containing the data read from the table.
@@ -108,12 +214,26 @@ class DataManager:
         Raises:
             Exception: If there is an error during database reading, such as table not found or other SQL errors.
         """
+        sql_query = f'SELECT * FROM `{table_name}`'
+        if limit is not None or offset != 0:
+            # SQLite needs a LIMIT for an OFFSET, -1 means no limit
+            sql_query = f'{sql_query} LIMIT {-1 if limit is None else int(limit)} OFFSET {int(offset)}'
+        # The SQLite specific LIMIT -1 is only sent through SQLAlchemy
+        use_connectorx = SQL_READER == 'connectorx' and self._connectorx_url is not None and (limit is not None or offset == 0)
         try:
-            sql_query = f'SELECT * FROM `{table_name}`'
-            df = pd.read_sql_query(sql_query, self.engine)
-            return df
-        except exc.SQLAlchemyError as e:
+            # The lock keeps the read from overlapping a table replace on the persistent connection
+            with self._lock:
+                if use_connectorx:
+                    import connectorx as cx
+                    df = cx.read_sql(self._connectorx_url, sql_query, return_type='pandas')
+                else:
+                    with self._conn.begin():
+                        df = pd.read_sql_query(sql_query, self._conn)
+        except (exc.SQLAlchemyError, RuntimeError) as e:
             raise CustomError(f'Database error while reading data from table {table_name}: {e}') from e
+        if offset:
+            df.index = pd.RangeIndex(offset, offset + len(df))
+        return df
 
     
     def save_data(self, table_name: str, data: pd.DataFrame) -> None:
@@ -128,6 +248,21 @@ class DataManager:
             Exception: If there is an error during database saving.
         """
         try:
-            data.to_sql(table_name, self.engine, if_exists='replace', index=False)
+            # The table no longer reflects a CSV file once it is overwritten
+            self._synced_tables.pop(table_name, None)
+            self._write_table(table_name, data)
         except exc.SQLAlchemyError as e:
-            raise CustomError(f'Database error while saving data to table {table_name}: {e}') from e
\ No newline at end of file
+            raise CustomError(f'Database error while saving data to table {table_name}: {e}') from e
+
+    def close(self) -> None:
+        """Closes the persistent database connection and disposes the engine."""
+        self._conn.close()
+        self.engine.dispose()
+
+    def __enter__(self) -> 'DataManager':
+        """Returns the DataManager for use as a context manager."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        """Closes the DataManager when leaving the context."""
+        self.close()
@@ -1,41 +1,167 @@
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+from itertools import repeat
 import logging
+import os
 from pathlib import Path
 import numpy as np
 import pandas as pd
 from src.application.DataManager import DataManager, DatasetType
-from src.application.Visualizer import Visualizer, VisualizationName
-from sklearn.linear_model import LinearRegression
+from src.application.Visualizer import MAX_POINTS_PER_SERIES, Visualizer, VisualizationName
+
+# Minimum number of squared deviations to compute before the search is spread over threads
+PARALLEL_MIN_ELEMENTS = 1_000_000
+
+
+def _hash_data_frames(*dataframes: pd.DataFrame, **settings) -> str:
+    """
+    Calculates a content hash over the column names and values of the DataFrames and the given settings.
+
+    Args:
+        *dataframes (pd.DataFrame): The DataFrames to hash, in order.
+        **settings: Further values the result depends on, e.g. the plot settings, hashed by their repr.
+
+    Returns:
+        str: Hex digest identifying the content of all DataFrames and the settings.
+    """
+    content_hash = hashlib.md5(repr(sorted(settings.items())).encode())
+    for df in dataframes:
+        content_hash.update(','.join(map(str, df.columns)).encode())
+        content_hash.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return content_hash.hexdigest()
+
+
+def _fit_linear(x: np.ndarray, y: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Fits y = intercept + slope * x with the closed-form least-squares solution.
+
+    Args:
+        x (np.ndarray): Array of x-values with shape (n,).
+        y (np.ndarray): Array of y-values with shape (n,) or (n, k) to fit k functions at once.
+
+    Returns:
+        tuple: Intercept and slope, scalars for a single function or arrays of shape (k,). For constant x the slope
+            is 0 and the intercept is the mean of y.
+    """
+    x_mean = x.mean()
+    y_mean = y.mean(axis=0)
+    x_centered = x - x_mean
+    x_variance = x_centered @ x_centered
+    if x_variance == 0:
+        return y_mean, np.zeros_like(y_mean)
+    slope = (x_centered @ (y - y_mean)) / x_variance
+    return y_mean - slope * x_mean, slope
+
+
+def _sum_squared_deviations(train_y: np.ndarray, y_predicted_ideal: np.ndarray) -> np.ndarray:
+    """
+    Calculates the sum of squared deviations of one training column to each predicted ideal function.
+
+    Args:
+        train_y (np.ndarray): Array of training y-values with shape (n,).
+        y_predicted_ideal (np.ndarray): Array of predicted ideal y-values with shape (n, ideal).
+
+    Returns:
+        np.ndarray: Sum of squared deviations per ideal function with shape (ideal,).
+    """
+    deviations = y_predicted_ideal - train_y[:, None]
+    return np.einsum('ij,ij->j', deviations, deviations)
+
+
+def _deviation_matrix(y_train: np.ndarray, y_predicted_ideal: np.ndarray) -> np.ndarray:
+    """
+    Calculates the sum of squared deviations of every training column to every predicted ideal function.
+
+    Args:
+        y_train (np.ndarray): Array of training y-values with shape (n, train).
+        y_predicted_ideal (np.ndarray): Array of predicted ideal y-values with shape (n, ideal).
+
+    Returns:
+        np.ndarray: Sum of squared deviations with shape (train, ideal), missing training values are skipped.
+    """
+    sums_squared_deviations = []
+    for train_y in y_train.T:
+        is_valid = ~np.isnan(train_y)
+        if is_valid.all():
+            sums_squared_deviations.append(_sum_squared_deviations(train_y, y_predicted_ideal))
+        else:
+            sums_squared_deviations.append(_sum_squared_deviations(train_y[is_valid], y_predicted_ideal[is_valid]))
+    return np.stack(sums_squared_deviations)
+
+
+def _map_test_points(x_test: np.ndarray,
+                     y_test: np.ndarray,
+                     intercepts: np.ndarray,
+                     slopes: np.ndarray,
+                     thresholds: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Maps each test point to the selected ideal function with the smallest deviation within its threshold.
+
+    Args:
+        x_test (np.ndarray): Array of test x-values with shape (test,).
+        y_test (np.ndarray): Array of test y-values with shape (test,).
+        intercepts (np.ndarray): Intercepts of the selected ideal functions with shape (selected,).
+        slopes (np.ndarray): Slopes of the selected ideal functions with shape (selected,).
+        thresholds (np.ndarray): Maximum allowed deviation per selected ideal function with shape (selected,).
+
+    Returns:
+        tuple: Index of the mapped ideal function per test point (-1 if none is within its threshold) and the
+            corresponding deviation (inf if unmapped).
+    """
+    # Deviation of each test point to each selected ideal function, shape (test, selected)
+    deviations = np.abs(y_test[:, None] - (intercepts + np.outer(x_test, slopes)))
+    within_threshold = deviations <= thresholds
+    deviations = np.where(within_threshold, deviations, np.inf)
+    best_indices = np.where(within_threshold.any(axis=1), deviations.argmin(axis=1), -1)
+    return best_indices, deviations.min(axis=1)
+
 
 class IdealFunctionsManager:
     """
     Manages a collection of ideal functions for mapping test data.
     """
 
-    def __init__(self, dataset_name: str):
-        """Initialize IdealFunctionsManager, setting up DataManager, Visualizer, and data structures."""
+    def __init__(self, dataset_name: str, database_url: str | None = None):
+        """Initialize IdealFunctionsManager, setting up DataManager, Visualizer, and data structures.
+
+        Args:
+            dataset_name (str): The name of the dataset to load.
+            database_url (str, optional): SQLAlchemy URL passed to both DataManagers instead of their database files,
+                e.g. 'sqlite://' for in-memory databases. Defaults to None.
+        """
         self.logger = logging.getLogger(__name__)
         self.logger.setLevel('INFO')
         self.dataset_name = dataset_name
+        self.database_url = database_url
         self.data_manager: DataManager
         self.results_db: DataManager
         self.visualizer: Visualizer = Visualizer()
         self.ideal_functions_selection: dict = {}
         self.ideal_functions_data: pd.DataFrame = pd.DataFrame()
         self.training_data_max_deviations: dict = {}
-        self.model = LinearRegression()
+        self.ideal_func_coeffs: dict[str, tuple[float, float]] = {}
+        self._thresholds: dict[str, float] = {}
         self._init_databases()
         
         
     def _init_databases(self) -> None:
         """Creates one DB for train, test and ideal data and also one DB for results."""
         try:
-            self.data_manager: DataManager = DataManager(self.dataset_name, database_name='data')
-            self.results_db: DataManager = DataManager(self.dataset_name, 'results')
+            self.data_manager: DataManager = DataManager(self.dataset_name, database_name='data', database_url=self.database_url)
+            self.results_db: DataManager = DataManager(self.dataset_name, 'results', database_url=self.database_url)
         except Exception as e:
             raise Exception(f'Error initializing DataManager: {e}') from e
 
+    def close(self) -> None:
+        """Closes the database connections of the data and results DataManager."""
+        self.data_manager.close()
+        self.results_db.close()
+
     def _load_data(self, data_type: DatasetType) -> pd.DataFrame:
         """Loads and returns the specified dataset using DataManager with error handling.
+
+        Only the in-memory DataFrame is needed here, so the dataset is not written to the database. DataManager caches
+        it until its CSV file changes.
         
         Args:
             data_type (DatasetType): Enum indicating the type of dataset to load.
@@ -45,7 +171,7 @@ class IdealFunctionsManager:
         
         """
         try:
-            data = self.data_manager.load_data(dataset_type=data_type)
+            data = self.data_manager.load_data_frame(dataset_type=data_type)
             if data.empty:
                 raise ValueError(f'No data loaded for {data_type.value} dataset type.')
             return data
@@ -58,6 +184,8 @@ class IdealFunctionsManager:
     def _calculate_squared_deviation(self, train_y: pd.Series, ideal_func_y: pd.Series, x: pd.Series) -> float:
         """
         Performs linear regression and calculates sum of squared deviations with error handling.
+
+        Single-pair wrapper around the vectorized kernel that get_ideal_functions applies to all ideal functions at once.
         
         Args:
             train_y (pd.Series): Series containing training data.
@@ -69,39 +197,56 @@ class IdealFunctionsManager:
 
         """
         try:
-            self.model.fit(x.values.reshape(-1, 1), ideal_func_y)
-            y_predicted_ideal = self.model.predict(x.values.reshape(-1, 1))
-            squared_deviations = (train_y - y_predicted_ideal)**2
-            total_squared_deviation = squared_deviations.sum()
-            return total_squared_deviation
+            x_values = np.asarray(x, dtype=np.float64)
+            intercept, slope = _fit_linear(x_values, np.asarray(ideal_func_y, dtype=np.float64))
+            y_predicted_ideal = intercept + slope * x_values
+            total_squared_deviation = _sum_squared_deviations(np.asarray(train_y, dtype=np.float64), y_predicted_ideal[:, None])
+            return float(total_squared_deviation[0])
         except Exception as e:
             raise Exception(f"Error calculating squared deviation: {e}") from e
         
     def get_all_functions_visualized(self) -> None:
         """Viusalizes test, train and ideal data in one plot.
+
+        The plot is only regenerated when the content hash of the data differs from the one stored next to the HTML
+        file in '<visualization>.html.sha'.
         
         Returns:
             None
         
         """
         try:
-            train_data = self._load_data(DatasetType.TRAIN)
-            test_data = self._load_data(DatasetType.TEST)
-            ideal_data = self._load_data(DatasetType.IDEAL)
+            # The three datasets are independent, so parse them concurrently (pandas releases the GIL while parsing)
+            dataset_types = (DatasetType.TRAIN, DatasetType.TEST, DatasetType.IDEAL)
+            with ThreadPoolExecutor(max_workers=len(dataset_types)) as executor:
+                train_data, test_data, ideal_data = executor.map(self._load_data, dataset_types)
         except Exception as e:
-            self.logger.error(f'Data loading failed in : {e}')
+            self.logger.error(f'Data loading failed in get_all_functions_visualized: {e}')
+            return
+
+        visualization_file_path = Path.cwd() / 'data' / self.dataset_name / f'{VisualizationName.initial_data.value}.html'
+        hash_file_path = visualization_file_path.with_name(f'{visualization_file_path.name}.sha')
+        # The plot depends on the data and on the plot settings, a change of either creates it again
+        plot_settings = {
+            'dataframe_names': ['Training Data', 'Test Data', 'Ideal Functions'],
+            'x_col': 'x',
+            'y_cols': train_data.columns[1:].tolist() + test_data.columns[1:].tolist() + ideal_data.columns[1:].tolist(),
+            'title': 'Training Data , Test Data and All Ideal Functions',
+            'max_points_per_series': MAX_POINTS_PER_SERIES,
+        }
+        data_hash = _hash_data_frames(train_data, test_data, ideal_data, **plot_settings)
+        if visualization_file_path.exists() and hash_file_path.exists() and hash_file_path.read_text() == data_hash:
+            self.logger.info(f'Initial data visualization {VisualizationName.initial_data.value}.html is up to date.')
             return
 
         # Create plot of Training and Ideal Data before selection
         try:
             self.visualizer.create_combined_plot(
                 dataframes=[train_data, test_data, ideal_data],
-                dataframe_names=['Training Data', 'Test Data', 'Ideal Functions'],
-                x_col='x',
-                y_cols=train_data.columns[1:].tolist() + test_data.columns[1:].tolist() + ideal_data.columns[1:].tolist(),
-                title='Training Data , Test Data and All Ideal Functions',
-                filename=Path.cwd() / 'data' / self.dataset_name / f'{VisualizationName.initial_data.value}.html',
+                filename=visualization_file_path,
+                **plot_settings,
             )
+            hash_file_path.write_text(data_hash)
             self.logger.info(f'Initial data visualization saved to as {VisualizationName.initial_data.value}.html')
         except Exception as vizualisation_err:
             self.logger.warning(f'Initial data visualization failed: {vizualisation_err}')
@@ -125,47 +270,61 @@ class IdealFunctionsManager:
         # Creates the initial visualization if not done beforehand
         self.get_all_functions_visualized()
 
-        # Initialize variables
-        best_ideal_functions_selection = {}
-        ideal_functions_data_temp = []
+        # Initialize variables, all y columns are bound once as contiguous matrices with their names in parallel lists
         x_values = train_data['x']
+        train_cols = train_data.columns[1:].tolist()
+        ideal_cols = ideal_data.columns[1:].tolist()
+        x = np.ascontiguousarray(x_values.to_numpy(), dtype=np.float64)
+        y_train = np.ascontiguousarray(train_data.iloc[:, 1:].to_numpy(), dtype=np.float64)
+        y_ideal = np.ascontiguousarray(ideal_data.iloc[:, 1:].to_numpy(), dtype=np.float64)
 
-        # Iterate each training data
-        for train_col in train_data.columns[1:]:
-            min_sum_squared_deviation = float('inf')
-            best_ideal_func_name = None
-            best_ideal_func_data = None
-            # Iterate each ideal data
-            for ideal_col in ideal_data.columns[1:]:
-                try:
-                    # Sum of all y-deviations squared
-                    sum_squared_deviation = self._calculate_squared_deviation(train_data[train_col], ideal_data[ideal_col], x_values)
-                except Exception as calc_err:
-                    self.logger.warning(f'Squared deviation calculation failed for {train_col} and {ideal_col}: {calc_err}')
-                    continue
-                # Find smallest deviation of the sum
-                if sum_squared_deviation < min_sum_squared_deviation:
-                    min_sum_squared_deviation = sum_squared_deviation
-                    best_ideal_func_name = ideal_col
-                    best_ideal_func_data = ideal_data[ideal_col].copy()
-            # Finally store best matches
-            best_ideal_functions_selection[train_col] = best_ideal_func_name
-            ideal_functions_data_temp.append(best_ideal_func_data)
+        try:
+            # Fit all ideal functions against x at once (intercept and slope per column)
+            intercepts, slopes = _fit_linear(x, y_ideal)
+            y_predicted_ideal = intercepts + np.outer(x, slopes)
+            # Sum of squared deviations of each training column to each ideal function, for large inputs the ideal
+            # functions are split into one block per thread (NumPy releases the GIL inside the kernels)
+            n_workers = min(len(ideal_cols), os.cpu_count() or 1)
+            if n_workers > 1 and y_predicted_ideal.size * len(train_cols) >= PARALLEL_MIN_ELEMENTS:
+                ideal_blocks = np.array_split(y_predicted_ideal, n_workers, axis=1)
+                with ThreadPoolExecutor(max_workers=n_workers) as executor:
+                    sum_squared_deviations = np.hstack(list(executor.map(_deviation_matrix, repeat(y_train), ideal_blocks)))
+            else:
+                sum_squared_deviations = _deviation_matrix(y_train, y_predicted_ideal)
+        except Exception as calc_err:
+            self.logger.error(f'Squared deviation calculation failed in get_ideal_functions: {calc_err}')
+            return
 
-            try:
-                # Now find the best ideal functions match for the train data
-                self.model.fit(x_values.values.reshape(-1, 1), ideal_data[best_ideal_func_name])
-                y_predicted_ideal_for_train = self.model.predict(x_values.values.reshape(-1, 1))
-                # Get max deviation out of column
-                max_deviation_train = max(abs(train_data[train_col] - y_predicted_ideal_for_train))
-                self.training_data_max_deviations[train_col] = max_deviation_train
-            except Exception as model_error:
-                self.logger.warning(f'Regression or deviation calculation failed for {train_col} and chosen {best_ideal_func_name}: {model_error}')
-                self.training_data_max_deviations[train_col] = np.nan
+        # Ideal functions with missing values cannot be fitted and are never selected
+        sum_squared_deviations[~np.isfinite(sum_squared_deviations)] = np.inf
+        # Get best ideal function and max deviation out of each training column, skipping missing training values
+        best_ideal_indices = sum_squared_deviations.argmin(axis=1)
+        max_deviations_train = np.nanmax(np.abs(y_train - y_predicted_ideal[:, best_ideal_indices]), axis=0)
+
+        # Fit the selected ideal functions once on the ideal data's own x for the test data mapping, the fit against
+        # the training x above is reused if both x grids are equal
+        ideal_x = np.ascontiguousarray(ideal_data['x'].to_numpy(), dtype=np.float64)
+        if np.array_equal(ideal_x, x):
+            mapping_intercepts, mapping_slopes = intercepts[best_ideal_indices], slopes[best_ideal_indices]
+        else:
+            mapping_intercepts, mapping_slopes = _fit_linear(ideal_x, y_ideal[:, best_ideal_indices])
+
+        # Finally store best matches together with their (intercept, slope) for reuse in the test data mapping
+        best_ideal_functions_selection = {}
+        self.ideal_func_coeffs = {}
+        for train_idx, train_col in enumerate(train_cols):
+            best_ideal_idx = best_ideal_indices[train_idx]
+            best_ideal_func_name = ideal_cols[best_ideal_idx]
+            best_ideal_functions_selection[train_col] = best_ideal_func_name
+            self.ideal_func_coeffs[best_ideal_func_name] = (mapping_intercepts[train_idx], mapping_slopes[train_idx])
+            self.training_data_max_deviations[train_col] = max_deviations_train[train_idx]
+            # Mapping criterion for test data (max_deviation * (2**0.5)), constant per selected function
+            self._thresholds[train_col] = max_deviations_train[train_idx] * np.sqrt(2)
 
         self.ideal_functions_selection = best_ideal_functions_selection
-        # Get the keys and the corresponding dataframes together in desired structure
-        self.ideal_functions_data = pd.DataFrame(dict(zip(best_ideal_functions_selection.keys(), ideal_functions_data_temp)))
+        # Select the chosen ideal columns in one step and label them with their training columns
+        self.ideal_functions_data = ideal_data[list(best_ideal_functions_selection.values())].set_axis(
+            list(best_ideal_functions_selection.keys()), axis=1)
 
         self.logger.info('Ideal functions selected for each training data column:')
         for train_col, ideal_col_name in self.ideal_functions_selection.items():
@@ -175,8 +334,11 @@ class IdealFunctionsManager:
         try:
             plot_dataframes = [train_data]
             plot_names = ['Training Data', 'Selected Ideal Functions']
-            # Add selected ideal functions data
-            plot_dataframes.append(pd.concat([x_values, self.ideal_functions_data], axis=1))
+            # Add selected ideal functions data, built from the aligned column arrays instead of a concat copy
+            plot_dataframes.append(pd.DataFrame(
+                {'x': x_values.to_numpy(),
+                 **{col: self.ideal_functions_data[col].to_numpy() for col in self.ideal_functions_data.columns}},
+                copy=False))
 
             self.visualizer.create_combined_plot(
                  dataframes=plot_dataframes,
@@ -214,47 +376,36 @@ class IdealFunctionsManager:
             self.logger.error(f'Data loading failed in map_test_data_to_ideal_functions: {e}')
             return
 
-        mapping_results = []
-        # Iterate through each test data
-        for _, test_row in test_data.iterrows():
-            x_test = test_row['x']
-            y_test = test_row['y']
-            min_deviation_test_point = float('inf')
-            
-            best_ideal_func_name_for_test_point = None
-            best_train_col_name_for_test_point = None
-            # Iterate through each chosen ideal function
-            for train_col_name, ideal_func_name in self.ideal_functions_selection.items():
-                ideal_func_y_data = ideal_data[ideal_func_name]
-
-                try:
-                    x_ideal_for_regression = ideal_data['x']
-                    self.model.fit(x_ideal_for_regression.values.reshape(-1, 1), ideal_func_y_data)
-                    y_predicted_ideal_for_test_x = self.model.predict(np.array([[x_test]]))
-                    deviation_test_point = abs(y_test - y_predicted_ideal_for_test_x[0])
-                    max_train_deviation_for_func = self.training_data_max_deviations[train_col_name]
-    	            # Now compare the deviation after the criterion (max_deviation * (2**0.5))
-                    if deviation_test_point <= max_train_deviation_for_func * (2**0.5):
-                        if deviation_test_point < min_deviation_test_point:
-                            min_deviation_test_point = deviation_test_point
-                            # Finally store data
-                            best_ideal_func_name_for_test_point = ideal_func_name
-                            best_train_col_name_for_test_point = train_col_name
-
-                except Exception as mapping_error:
-                    self.logger.warning(f'Mapping process error for test point x={x_test}, y={y_test} with ideal function {ideal_func_name}: {mapping_error}')
-                    continue
-            # Append each point to results
-            if best_ideal_func_name_for_test_point:
-                mapping_results.append({
-                    'x': x_test,
-                    'y': y_test,
-                    'Delta Y': min_deviation_test_point,
-                    'No. of ideal func': best_ideal_func_name_for_test_point,
-                    'training_data_column': best_train_col_name_for_test_point
-                })
-
-        results_df = pd.DataFrame(mapping_results)
+        if not self.ideal_functions_selection:
+            self.logger.error('No ideal functions selected. Run get_ideal_functions before mapping test data.')
+            return
+
+        selected_train_cols = list(self.ideal_functions_selection.keys())
+        selected_ideal_cols = list(self.ideal_functions_selection.values())
+        # Raw float arrays of all test points, extracted in one pass instead of per row
+        x_test, y_test = np.ascontiguousarray(test_data[['x', 'y']].to_numpy(dtype=np.float64).T)
+
+        try:
+            # Coefficients of the selected ideal functions fitted on the ideal data's x during the selection
+            intercepts, slopes = np.array([self.ideal_func_coeffs[ideal_col] for ideal_col in selected_ideal_cols]).T
+            # Now compare the deviation after the precomputed criterion (max_deviation * (2**0.5))
+            thresholds = np.array([self._thresholds[train_col] for train_col in selected_train_cols])
+            best_indices, min_deviations = _map_test_points(x_test, y_test, intercepts, slopes, thresholds)
+        except Exception as mapping_error:
+            self.logger.error(f'Mapping process error in map_test_data_to_ideal_functions: {mapping_error}')
+            return
+
+        # Points without any deviation within the criterion stay unmapped
+        is_mapped = best_indices >= 0
+        best_indices = best_indices[is_mapped]
+
+        results_df = pd.DataFrame({
+            'x': x_test[is_mapped],
+            'y': y_test[is_mapped],
+            'Delta Y': min_deviations[is_mapped],
+            'No. of ideal func': np.array(selected_ideal_cols, dtype=object)[best_indices],
+            'training_data_column': np.array(selected_train_cols, dtype=object)[best_indices]
+        })
         try:
             # Drop the column to match with the desired table in the assignment
             self._store_results(results_df.drop('training_data_column', axis=1))
@@ -268,21 +419,24 @@ class IdealFunctionsManager:
 
             # Visualize Mapped Test Data
             try:
-                # Load mapped test data from database for visualization
-                mapped_test_data_from_db = self.results_db.read_data_from_table('TestDataMapping')
+                # Use the mapped test data as stored in the database without reading it back
+                mapped_test_data = results_df.drop(columns=['training_data_column'])
 
-                plot_dataframes = [mapped_test_data_from_db]
+                plot_dataframes = [mapped_test_data]
                 plot_names = ['Mapped Test Data', 'Corresponding Ideal Functions']
 
                 # Add corresponding selected ideal functions for visualization context
-                ideal_funcs_for_mapped_test = self.ideal_functions_data[results_df['training_data_column'].unique().tolist()]
-                plot_dataframes.append(pd.concat([ideal_data['x'], ideal_funcs_for_mapped_test], axis=1).dropna(subset=['x']))
+                mapped_train_cols = results_df['training_data_column'].unique().tolist()
+                plot_dataframes.append(pd.DataFrame(
+                    {'x': ideal_data['x'].to_numpy(),
+                     **{col: self.ideal_functions_data[col].to_numpy() for col in mapped_train_cols}},
+                    copy=False).dropna(subset=['x']))
 
                 self.visualizer.create_combined_plot(
                     dataframes=plot_dataframes,
                     dataframe_names=plot_names,
                     x_col='x',
-                    y_cols=['y'] + ideal_funcs_for_mapped_test.columns.tolist(),
+                    y_cols=['y'] + mapped_train_cols,
                     title='Mapped Test Data and Corresponding Ideal Functions',
                     filename=Path.cwd() / 'data' / self.dataset_name / f'{VisualizationName.mapped_test_data.value}.html')
                 self.logger.info(f'Mapped test data visualization saved as {VisualizationName.mapped_test_data.value}.html')
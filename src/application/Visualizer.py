@@ -1,11 +1,17 @@
 from enum import Enum
 import logging
 from pathlib import Path
-from bokeh.plotting import figure, save, output_file
-from bokeh.models import Legend, ColumnDataSource
-from bokeh.palettes import Category20
+from typing import TYPE_CHECKING
 import pandas as pd
 
+# Bokeh is imported where plots are built, so importing this module (e.g. for VisualizationName) stays cheap
+if TYPE_CHECKING:
+    from bokeh.models import Legend
+    from bokeh.plotting import figure
+
+# Default maximum number of points plotted per series
+MAX_POINTS_PER_SERIES = 2000
+
 class VisualizationName(Enum):
     """Enumeration of visualization names."""
     initial_data = 'initial_data'
@@ -26,7 +32,7 @@ class Visualizer:
         self.logger = logging.getLogger(__name__)
         self.logger.setLevel('INFO')
 
-    def _configure_legend_layout(self, legend: Legend, plot: figure) -> None:
+    def _configure_legend_layout(self, legend: 'Legend', plot: 'figure') -> None:
         """
         Configures the layout and style of the legend and adds it to the plot.
 
@@ -41,13 +47,14 @@ class Visualizer:
         legend.label_text_font_size = '12px'
         self.logger.info('Legend configured and added to plot.')
 
-    def _save_plot(self, plot: figure, filename:str | Path) -> None:
+    def _save_plot(self, plot: 'figure', filename:str | Path) -> None:
         """Saves the plot to Dataset specific folder (created if not existing).
         
         Args:
             plot (figure): The Bokeh figure to save.
             filename (str or Path): The name of the file.
         """
+        from bokeh.plotting import output_file, save
 
         Path(filename).parent.mkdir(parents=True, exist_ok=True)
 
@@ -60,7 +67,8 @@ class Visualizer:
                              dataframe_names:list, x_col:str,
                              y_cols:list[str], 
                              title:str='Combined Data Plot', 
-                             filename:str | Path='combined_plot.html') -> None:
+                             filename:str | Path='combined_plot.html',
+                             max_points_per_series:int | None=MAX_POINTS_PER_SERIES) -> None:
         """
         Creates a combined Bokeh scatter plot from multiple DataFrames with responsive sizing.
 
@@ -71,8 +79,13 @@ class Visualizer:
             y_cols (list): A list of column names for the y-axis.
             title (str): The title of the plot.
             filename (str or Path): The name of the output HTML file.
+            max_points_per_series (int, optional): Maximum number of points plotted per series, larger DataFrames are
+                thinned by taking every n-th row. None disables downsampling. Defaults to MAX_POINTS_PER_SERIES.
         """
-        
+        from bokeh.models import ColumnDataSource, Legend
+        from bokeh.palettes import Category20
+        from bokeh.plotting import figure
+
         plot = figure(title=title, x_axis_label=x_col, y_axis_label='Y Values',
                       sizing_mode='stretch_both',
                       width=1000, height=800)
@@ -90,9 +103,20 @@ class Visualizer:
                 if df_col_name in y_cols:
                     y_cols_for_df.append(df_col_name)
 
-            # Add each source and change color per plot
+            if not y_cols_for_df:
+                continue
+
+            # Thin out large dataframes to keep the HTML output and browser rendering small
+            if max_points_per_series and len(df) > max_points_per_series:
+                stride = -(-len(df) // max_points_per_series)
+                df = df.iloc[::stride]
+                self.logger.info(f'{df_name} downsampled with stride {stride} ({len(df)} points per series).')
+
+            # One source per dataframe with only the plotted columns, shared by all of its glyphs
+            source = ColumnDataSource({col: df[col].to_numpy() for col in [x_col] + y_cols_for_df})
+
+            # Add each glyph and change color per plot
             for y_col in y_cols_for_df:
-                source = ColumnDataSource(df)
                 color = default_colors[color_index % len(default_colors)]
                 glyph = plot.scatter(x=x_col, y=y_col, source=source, color=color, size=5, alpha=0.6)
                 items.append((f"{df_name} - {y_col}", [glyph]))
@@ -1,28 +1,109 @@
+import asyncio
 from collections.abc import AsyncGenerator
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import asynccontextmanager
+from importlib.util import find_spec
+import logging
 import os
 from pathlib import Path
 
-from src.application.DataManager import DatasetType
+from src.application.DataManager import TABLE_NAMES, DatasetType
 from src.application.Visualizer import VisualizationName
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.openapi.docs import get_redoc_html, get_swagger_ui_html
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse, Response
 from fastapi.staticfiles import StaticFiles
-from src.application.IdealFunctionsManager import IdealFunctionsManager
+from starlette.types import Scope
+
+# Part of the accel extra, without it FastJSONResponse falls back to Starlette's JSON rendering
+if find_spec('orjson') is not None:
+    import orjson
+else:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# Default number of rows per table view page
+TABLE_PAGE_SIZE = 100
+
+# Separate thread for the selection, mapping and visualization endpoints that create Bokeh plots, so slow plotting
+# cannot use up the default threads of the data endpoints. A single worker runs them one after another, as they
+# share the state of the IdealFunctionsManager and write the same HTML files
+VISUALIZATION_WORKERS = 1
+
+# URL under which the visualization files of the selected dataset are served
+VISUALIZATIONS_STATIC_PATH = '/v1/visualizations-static'
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson (also serializing NumPy values) when it is installed.
+
+    Replaces FastAPI's ORJSONResponse, which is deprecated in recent FastAPI versions.
+    """
+
+    def render(self, content) -> bytes:
+        """Serializes the content to JSON bytes, NaN is written as null and NumPy scalars and arrays as JSON values."""
+        if orjson is None:
+            return super().render(content)
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+
+class _VisualizationFiles(StaticFiles):
+    """StaticFiles serving only the HTML files of a dataset directory, the CSV and SQLite files stay private."""
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        if not path.endswith('.html'):
+            raise HTTPException(status_code=404)
+        return await super().get_response(path, scope)
+
+
+def _table_view_html(title: str, records_url: str, offset: int, limit: int) -> str:
+    """Creates the HTML page of a table view, the rows are fetched page by page from records_url by table-view.js."""
+    return f"""
+        <!DOCTYPE html>
+        <html>
+        <head>
+        <title>Table View</title>
+        <link rel="stylesheet" href="/static/table-template.css">
+        <script src="/static/table-view.js" defer></script>
+        </head>
+        <body>
+        <h1>{title}</h1>
+        <div class="table-view" data-records-url="{records_url}" data-offset="{offset}" data-limit="{limit}"></div>
+        </body>
+        </html>
+        """
 
 @asynccontextmanager
-async def lifespan(_: FastAPI) -> AsyncGenerator:
+async def lifespan(app: FastAPI) -> AsyncGenerator:
     global dataset_name
     global ideal_function_manager
+    global visualization_executor
+    # Imported on startup so that importing this module does not load Bokeh and the selection code
+    from src.application.IdealFunctionsManager import IdealFunctionsManager
 
+    visualization_executor = ThreadPoolExecutor(max_workers=VISUALIZATION_WORKERS, thread_name_prefix='visualization')
     dataset_name = os.environ['DATASET_NAME'] if 'DATASET_NAME' in os.environ else 'Dataset1'
     ideal_function_manager = IdealFunctionsManager(dataset_name=dataset_name)
+    # Point the visualization mount to the selected dataset, the dataset is only known on startup
+    visualization_files.all_directories = visualization_files.get_directories(
+        directory=Path.cwd() / 'data' / dataset_name)
+    # Parse every dataset and fill its table once, requests then reuse the cached DataFrames
+    for dataset_type in DatasetType:
+        try:
+            ideal_function_manager.data_manager.load_data(dataset_type=dataset_type)
+        except Exception as e:
+            logger.warning(f'Preloading {dataset_type.value} data failed: {e}')
     yield
+    # Release the visualization threads and the persistent database connections on shutdown
+    visualization_executor.shutdown(wait=True)
+    ideal_function_manager.close()
 
 app = FastAPI(
     title='ideal-functions-app',
     description='[ideal-functions-API]',
+    default_response_class=FastJSONResponse,
     lifespan=lifespan
 )
 
@@ -30,6 +111,10 @@ app = FastAPI(
 app.mount('/static', StaticFiles(directory='./src/application/rest/static'),
           name='static')
 
+# Visualizations of the selected dataset, its directory is set in lifespan
+visualization_files = _VisualizationFiles(check_dir=False)
+app.mount(VISUALIZATIONS_STATIC_PATH, visualization_files, name='viz-static')
+
 @app.get('/', tags=['Root'])
 async def root(request: Request) -> HTMLResponse:
     """Gets the root endpoint of the service.
@@ -75,17 +160,18 @@ async def redoc_html() -> HTMLResponse:
 
 
 @app.post('/v1/ideal-functions/select', tags=['Ideal Functions'])
-async def select_ideal_functions() -> JSONResponse:
+async def select_ideal_functions() -> FastJSONResponse:
     """
     Initiates the ideal function selection process.
 
     Returns:
-        JSONResponse: Status message and details of selected ideal functions.
+        FastJSONResponse: Status message and details of selected ideal functions.
     """
     try:
-        ideal_function_manager.get_ideal_functions()
+        await asyncio.get_running_loop().run_in_executor(visualization_executor,
+                                                         ideal_function_manager.get_ideal_functions)
         selection_info = ideal_function_manager.ideal_functions_selection
-        return JSONResponse(
+        return FastJSONResponse(
             content={'message': 'Ideal function selection completed successfully.',
                      'selected_functions': selection_info},
             status_code=200
@@ -95,17 +181,19 @@ async def select_ideal_functions() -> JSONResponse:
 
 
 @app.post('/v1/test-data/map', tags=['Test Data Mapping'])
-async def map_test_data() -> JSONResponse:
+async def map_test_data() -> FastJSONResponse:
     """
     Initiates the test data mapping process to ideal functions.
 
     Returns:
-        JSONResponse: Status message and summary of the mapping results.
+        FastJSONResponse: Status message and summary of the mapping results.
     """
     try:
-        ideal_function_manager.map_test_data_to_ideal_functions()
-        mapping_summary = f"{len(ideal_function_manager.results_db.read_data_from_table(table_name='TestDataMapping'))} test points mapped."
-        return JSONResponse(
+        await asyncio.get_running_loop().run_in_executor(visualization_executor,
+                                                         ideal_function_manager.map_test_data_to_ideal_functions)
+        mapping_results = await run_in_threadpool(ideal_function_manager.results_db.read_data_from_table, table_name='TestDataMapping')
+        mapping_summary = f"{len(mapping_results)} test points mapped."
+        return FastJSONResponse(
             content={'message': 'Test data mapping completed.',
                      'mapping_summary': mapping_summary},
             status_code=200
@@ -113,149 +201,137 @@ async def map_test_data() -> JSONResponse:
     except Exception as e:
         raise HTTPException(status_code=500, detail=f'Test data mapping failed: {e}')
     
-@app.get('/v1/visualizations/all', tags=['Visualizations'], response_class=HTMLResponse)
-async def get_all_data_visualization() -> HTMLResponse:
+@app.get('/v1/visualizations/all', tags=['Visualizations'], response_class=RedirectResponse)
+async def get_all_data_visualization() -> RedirectResponse:
     """
-    Serves the requested Bokeh visualization HTML file.
-    
+    Creates the Bokeh visualization of the train, ideal and test data if it is outdated and redirects to its HTML file
+    served from the static visualization mount.
+
     Returns:
-        FileResponse: The HTML file containing the Bokeh visualization.
-    Raises:
-        HTTPException: 404 if the visualization file is not found.
+        RedirectResponse: Redirect to the HTML file containing the Bokeh visualization, the mount answers 404 if the
+        file could not be created.
     """
-    ideal_function_manager.get_all_functions_visualized()
-    visualization_file_path = (
-        Path.cwd() / 
-        'data' / 
-        dataset_name / 
-        f'{VisualizationName.initial_data.value}.html'
-    )
-    try:
-        with open(visualization_file_path) as file:
-            html_content = file.read()
-        return HTMLResponse(content=html_content)
-    except FileNotFoundError:
-        raise HTTPException(status_code=404, detail='Visualization initial_data not found.')
-
-@app.get('/v1/visualizations/{visualization_name}', tags=['Visualizations'], response_class=HTMLResponse)
-async def get_visualization(visualization_name: VisualizationName) -> HTMLResponse:
+    await asyncio.get_running_loop().run_in_executor(visualization_executor,
+                                                     ideal_function_manager.get_all_functions_visualized)
+    return RedirectResponse(url=f'{VISUALIZATIONS_STATIC_PATH}/{VisualizationName.initial_data.value}.html')
+
+@app.get('/v1/visualizations/{visualization_name}', tags=['Visualizations'], response_class=RedirectResponse)
+async def get_visualization(visualization_name: VisualizationName) -> RedirectResponse:
     """
-    Serves the requested Bokeh visualization HTML file.
+    Redirects to the requested Bokeh visualization HTML file served from the static visualization mount.
 
     Args:
         visualization_name (VisualizationName): The names of the visualization files.
 
     Returns:
-        FileResponse: The HTML file containing the Bokeh visualization.
-    Raises:
-        HTTPException: 404 if the visualization file is not found.
+        RedirectResponse: Redirect to the HTML file containing the Bokeh visualization.
     """
-    visualization_file_path = Path.cwd() / 'data' / dataset_name /  f'{visualization_name.value}.html'
+    return RedirectResponse(url=f'{VISUALIZATIONS_STATIC_PATH}/{visualization_name.value}.html')
 
-    try:
-        with open(visualization_file_path) as file:
-            html_content = file.read()
-        return HTMLResponse(content=html_content)
-    except FileNotFoundError:
-        raise HTTPException(status_code=404, detail=f'Visualization {visualization_name} not found.')
-
-@app.get('/v1/data/load-data', tags=['Data'])
-async def load_data(dataset_type: DatasetType) -> JSONResponse:
+@app.get('/v1/data/load-data', tags=['Data'], deprecated=True)
+async def load_data(dataset_type: DatasetType) -> FastJSONResponse:
     """
     Load the selected train, test or ideal data into DB for table view.
 
+    Deprecated: the table view reads its pages from /v1/data/database-records, which needs no preceding load.
+
     Returns:
-        JSONResponse: Status message.
+        FastJSONResponse: Status message.
     Raises:
-        JSONResponse: 500 if there is an error loading data.
+        FastJSONResponse: 500 if there is an error loading data.
     """
     try:
-        results_df = ideal_function_manager.data_manager.load_data(dataset_type=dataset_type) 
+        results_df = await run_in_threadpool(ideal_function_manager.data_manager.load_data, dataset_type=dataset_type)
         if results_df.empty:
-            return JSONResponse(content={'message': 'No data found.',}, status_code=404) 
-        return JSONResponse(content={'message': 'Loaded data successfully.',}, status_code=200)
+            return FastJSONResponse(content={'message': 'No data found.',}, status_code=404) 
+        return FastJSONResponse(content={'message': 'Loaded data successfully.',}, status_code=200)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f'Error loading data into database: {e}')
 
-@app.get('/v1/data/database-view', tags=['Data'])
-async def get_database(dataset_type: DatasetType) -> HTMLResponse:
+@app.get('/v1/data/database-view', tags=['Data'], response_class=HTMLResponse)
+async def get_database(dataset_type: DatasetType,
+                       offset: int = Query(0, ge=0),
+                       limit: int = Query(TABLE_PAGE_SIZE, ge=1)) -> HTMLResponse:
     """
-    Retrieves the selected train, test or ideal data from DB for table view.
+    Serves the table view of the selected train, test or ideal data, its pages are loaded from
+    /v1/data/database-records in the browser.
+
+    Args:
+        dataset_type (DatasetType): The dataset to show.
+        offset (int): Index of the first row of the first page.
+        limit (int): Number of rows per page.
 
     Returns:
         HTMLResponse: Tableview of the selected data.
+    """
+    return HTMLResponse(content=_table_view_html(f'Database view with FastAPI: {TABLE_NAMES[dataset_type]}',
+                                                 f'/v1/data/database-records?dataset_type={dataset_type.value}',
+                                                 offset, limit),
+                        status_code=200)
+
+@app.get('/v1/data/database-records', tags=['Data'])
+async def get_database_records(dataset_type: DatasetType,
+                               offset: int = Query(0, ge=0),
+                               limit: int = Query(TABLE_PAGE_SIZE, ge=1)) -> Response:
+    """
+    Retrieves one page of the selected train, test or ideal data as JSON records.
+
+    The page is sliced from the cached DataFrame of the CSV file, which holds the same rows as the database table, so
+    neither a table write nor a SQL query is needed.
+
+    Args:
+        dataset_type (DatasetType): The dataset to read.
+        offset (int): Index of the first row of the page.
+        limit (int): Maximum number of rows of the page.
+
+    Returns:
+        Response: JSON array with one object per row.
     Raises:
         HTTPException: 500 if there is an error retrieving data.
     """
     try:
-        if dataset_type == DatasetType.TRAIN:
-            table_name = 'TrainingData'
-        elif dataset_type == DatasetType.IDEAL:
-            table_name = 'IdealFunctions'
-        elif dataset_type == DatasetType.TEST:
-            table_name = 'TestData'
-
-        results_df = ideal_function_manager.data_manager.read_data_from_table(table_name=table_name) 
-        if results_df.empty:
-            return HTMLResponse(content={'message': 'No data found.'}, status_code=200) 
-        
-        html_table = results_df.to_html(
-        classes='styled-table',  # Add a CSS class named "styled-table"
-        index=True,              # show index column
-        na_rep='-',              # Represent NaN as hyphen
-        )
-        # Adopted from https://pandas.pydata.org/docs/reference/api/pandas.DataFrame.to_html.html
-        html_content = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-        <title>Pandas Table</title>
-        <link rel="stylesheet" href="/static/table-template.css">  
-        </head>
-        <body>
-        <h1>Database view with FastAPI: {table_name} </h1>
-        {html_table}
-        </body>
-        </html>
-        """
-        return HTMLResponse(content=html_content, status_code=200)
+        data_df = await run_in_threadpool(ideal_function_manager.data_manager.load_data_frame, dataset_type=dataset_type)
+        results_df = data_df.iloc[offset:offset + limit]
+        return Response(content=results_df.to_json(orient='records'), media_type='application/json')
     except Exception as e:
         raise HTTPException(status_code=500, detail=f'Error retrieving data from database: {e}')
 
-@app.get('/v1/data/test-mapping-results', tags=['Data'])
-async def get_test_mapping_results() -> HTMLResponse:
+@app.get('/v1/data/test-mapping-results', tags=['Data'], response_class=HTMLResponse)
+async def get_test_mapping_results(offset: int = Query(0, ge=0),
+                                   limit: int = Query(TABLE_PAGE_SIZE, ge=1)) -> HTMLResponse:
     """
-    Retrieves the test data mapping results from the database.
+    Serves the table view of the test data mapping results, its pages are loaded from
+    /v1/data/test-mapping-records in the browser.
+
+    Args:
+        offset (int): Index of the first row of the first page.
+        limit (int): Number of rows per page.
 
     Returns:
         HTMLResponse: Tableview of mapping results.
+    """
+    return HTMLResponse(content=_table_view_html('Database view with FastAPI: Test Data Mapping',
+                                                 '/v1/data/test-mapping-records', offset, limit),
+                        status_code=200)
+
+@app.get('/v1/data/test-mapping-records', tags=['Data'])
+async def get_test_mapping_records(offset: int = Query(0, ge=0),
+                                   limit: int = Query(TABLE_PAGE_SIZE, ge=1)) -> Response:
+    """
+    Retrieves one page of the test data mapping results from the database as JSON records.
+
+    Args:
+        offset (int): Index of the first row of the page.
+        limit (int): Maximum number of rows of the page.
+
+    Returns:
+        Response: JSON array with one object per row.
     Raises:
         HTTPException: 500 if there is an error retrieving data.
     """
     try:
-        results_df = ideal_function_manager.results_db.read_data_from_table(table_name='TestDataMapping') 
-        if results_df.empty:
-            return HTMLResponse(content={'message': 'No test data mappings found.'}, status_code=200) 
-        
-        html_table = results_df.to_html(
-        classes='styled-table',  # Add a CSS class named "styled-table"
-        index=True,              # show index column
-        na_rep='-',              # Represent NaN as hyphen
-        )
-        # Adopted from https://pandas.pydata.org/docs/reference/api/pandas.DataFrame.to_html.html
-        html_content = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-        <title>Pandas Table</title>
-        <link rel="stylesheet" href="/static/table-template.css">  
-        </head>
-        <body>
-        <h1>Database view with FastAPI: Test Data Mapping</h1>
-        {html_table}
-        </body>
-        </html>
-        """
-        return HTMLResponse(content=html_content, status_code=200)
+        results_df = await run_in_threadpool(ideal_function_manager.results_db.read_data_from_table,
+                                             table_name='TestDataMapping', limit=limit, offset=offset)
+        return Response(content=results_df.to_json(orient='records'), media_type='application/json')
     except Exception as e:
         raise HTTPException(status_code=500, detail=f'Error retrieving test mapping results from database: {e}')
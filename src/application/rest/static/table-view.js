@@ -0,0 +1,61 @@
+/* Renders the table views: fetches one page of JSON records at a time and builds the styled table in the browser */
+
+function renderTableView(container) {
+    const recordsUrl = container.dataset.recordsUrl;
+    const limit = parseInt(container.dataset.limit, 10);
+    let offset = parseInt(container.dataset.offset, 10);
+
+    const table = document.createElement('table');
+    table.className = 'styled-table';
+    const status = document.createElement('p');
+    const previousButton = document.createElement('button');
+    previousButton.textContent = 'Previous';
+    const nextButton = document.createElement('button');
+    nextButton.textContent = 'Next';
+    container.append(previousButton, nextButton, status, table);
+
+    async function loadPage() {
+        const url = new URL(recordsUrl, window.location.origin);
+        url.searchParams.set('offset', offset);
+        url.searchParams.set('limit', limit);
+        const response = await fetch(url);
+        if (!response.ok) {
+            status.textContent = `Error loading data (${response.status}).`;
+            return;
+        }
+        const records = await response.json();
+        table.replaceChildren();
+        previousButton.disabled = offset === 0;
+        nextButton.disabled = records.length < limit;
+        if (records.length === 0) {
+            status.textContent = 'No data found.';
+            return;
+        }
+        status.textContent = `Rows ${offset} to ${offset + records.length - 1}`;
+
+        // Header with an index column like the pandas table view
+        const headerRow = table.createTHead().insertRow();
+        for (const column of ['', ...Object.keys(records[0])]) {
+            const th = document.createElement('th');
+            th.textContent = column;
+            headerRow.appendChild(th);
+        }
+        const body = table.createTBody();
+        records.forEach((record, i) => {
+            const row = body.insertRow();
+            const th = document.createElement('th');
+            th.textContent = offset + i;
+            row.appendChild(th);
+            for (const value of Object.values(record)) {
+                // NaN is sent as null and shown as hyphen
+                row.insertCell().textContent = value === null ? '-' : value;
+            }
+        });
+    }
+
+    previousButton.addEventListener('click', () => { offset = Math.max(0, offset - limit); loadPage(); });
+    nextButton.addEventListener('click', () => { offset += limit; loadPage(); });
+    loadPage();
+}
+
+document.querySelectorAll('.table-view').forEach(renderTableView);
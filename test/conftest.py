@@ -0,0 +1,17 @@
+import pytest
+from src.application.IdealFunctionsManager import IdealFunctionsManager
+
+
+@pytest.fixture(scope='session')
+def simulated_ideal_functions_manager():
+    """Fixture to create a simulated IdealFunctionsManager instance with in-memory databases for testing."""
+    ideal_functions_manager = IdealFunctionsManager(dataset_name='Testdata', database_url='sqlite://')
+    yield ideal_functions_manager
+    ideal_functions_manager.close()
+
+@pytest.fixture(scope='session')
+def pipeline_ran(simulated_ideal_functions_manager:IdealFunctionsManager):
+    """Fixture running the ideal function selection and the test data mapping once for the test session."""
+    simulated_ideal_functions_manager.get_ideal_functions()
+    simulated_ideal_functions_manager.map_test_data_to_ideal_functions()
+    return simulated_ideal_functions_manager
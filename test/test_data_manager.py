@@ -1,11 +1,18 @@
+import shutil
+from pathlib import Path
+import pandas as pd
 import pytest
-from src.application.DataManager import DataManager, DatasetType
+import src.application.DataManager as data_manager_module
+from src.application.DataManager import TABLE_NAMES, DataManager, DatasetType
 
 @pytest.fixture
 def simulated_data_manager():
     """Fixture to create a test DataManager object."""
-    yield DataManager(dataset_name='Testdata',
-                      database_name='Testdatabase')
+    # In-memory database, nothing is written to disk
+    with DataManager(dataset_name='Testdata',
+                     database_name='Testdatabase',
+                     database_url='sqlite://') as data_manager:
+        yield data_manager
         
 @pytest.mark.parametrize('dataset_type', DatasetType)
 def test_load_data(simulated_data_manager: DataManager, dataset_type) -> None:
@@ -13,6 +20,45 @@ def test_load_data(simulated_data_manager: DataManager, dataset_type) -> None:
     simulated_data_manager.load_data(dataset_type)
 
 
+@pytest.mark.parametrize('dataset_type', DatasetType)
+def test_load_data_frame(simulated_data_manager: DataManager, dataset_type) -> None:
+    """Test the load_data_frame method of DataManager."""
+    data_frame = simulated_data_manager.load_data_frame(dataset_type)
+    assert not data_frame.empty
+
+
+@pytest.mark.parametrize('dataset_type', DatasetType)
+def test_load_data_frame_engines(monkeypatch, dataset_type) -> None:
+    """Test that the pyarrow and the C engine parse the CSV files into equal DataFrames."""
+    pytest.importorskip('pyarrow')
+    data_frames = {}
+    for engine in ('pyarrow', 'c'):
+        monkeypatch.setattr(data_manager_module, 'CSV_ENGINE', engine)
+        with DataManager(dataset_name='Testdata', database_name='Testdatabase', database_url='sqlite://') as data_manager:
+            data_frames[engine] = data_manager.load_data_frame(dataset_type)
+    pd.testing.assert_frame_equal(data_frames['pyarrow'], data_frames['c'])
+
+
+@pytest.mark.parametrize('engine', ['pyarrow', 'c'])
+def test_load_data_frame_parser_error(monkeypatch, tmp_path, engine) -> None:
+    """Test that both engines raise a ParserError for a malformed CSV file."""
+    if engine == 'pyarrow':
+        pytest.importorskip('pyarrow')
+    monkeypatch.setattr(data_manager_module, 'CSV_ENGINE', engine)
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'data' / 'Malformed').mkdir(parents=True)
+    (tmp_path / 'data' / 'Malformed' / 'train.csv').write_text('x,y1\n1,2\n3,4,5\n')
+    with DataManager(dataset_name='Malformed', database_name='Testdatabase', database_url='sqlite://') as data_manager:
+        with pytest.raises(pd.errors.ParserError):
+            data_manager.load_data_frame(DatasetType.TRAIN)
+
+
+def test_load_data_cached(simulated_data_manager: DataManager) -> None:
+    """Test that load_data reuses the parsed DataFrame while the CSV file is unchanged."""
+    data_frame = simulated_data_manager.load_data(DatasetType.TRAIN)
+    assert simulated_data_manager.load_data(DatasetType.TRAIN) is data_frame
+
+
 def test_load_invalid_data(simulated_data_manager: DataManager) -> None:
     """Test the load_data method with an invalid dataset type."""
     with pytest.raises(AttributeError):
@@ -22,13 +68,14 @@ def test_load_invalid_data(simulated_data_manager: DataManager) -> None:
 def test_read_data_from_table(simulated_data_manager: DataManager, dataset_type) -> None:
     """Test the read_data_from_table method of DataManager."""
     simulated_data_manager.load_data(dataset_type)
-    if dataset_type == DatasetType.TRAIN:
-        table_name = 'TrainingData'
-    elif dataset_type == DatasetType.IDEAL:
-        table_name = 'IdealFunctions'
-    elif dataset_type == DatasetType.TEST:
-        table_name = 'TestData'
-    simulated_data_manager.read_data_from_table(table_name)
+    simulated_data_manager.read_data_from_table(TABLE_NAMES[dataset_type])
+
+def test_read_data_from_table_with_limit(simulated_data_manager: DataManager) -> None:
+    """Test the read_data_from_table method with limit and offset."""
+    simulated_data_manager.load_data(DatasetType.TRAIN)
+    data_frame = simulated_data_manager.read_data_from_table(TABLE_NAMES[DatasetType.TRAIN], limit=5, offset=10)
+    assert len(data_frame) == 5
+    assert data_frame.index[0] == 10
 
 @pytest.mark.parametrize('dataset_type', DatasetType)
 def test_read_invalid_data_from_table(simulated_data_manager: DataManager, dataset_type) -> None:
@@ -48,4 +95,32 @@ def test_save_invalid_data(simulated_data_manager: DataManager, dataset_type) ->
     """Test the save_data method with an invalid table name."""
     invalid_data = [2,2]
     with pytest.raises(AttributeError):
-        simulated_data_manager.save_data(dataset_type.value, invalid_data)
\ No newline at end of file
+        simulated_data_manager.save_data(dataset_type.value, invalid_data)
+
+
+def test_read_data_from_table_connectorx(monkeypatch, tmp_path) -> None:
+    """Test that connectorx reads the same rows as SQLAlchemy from a database file in a path with a space."""
+    connectorx = pytest.importorskip('connectorx')
+    read_sql = connectorx.read_sql
+    connectorx_urls = []
+
+    def _read_sql_spy(url, *args, **kwargs):
+        connectorx_urls.append(url)
+        return read_sql(url, *args, **kwargs)
+
+    monkeypatch.setattr(connectorx, 'read_sql', _read_sql_spy)
+    dataset_dir = tmp_path / 'data' / 'Test data'
+    shutil.copytree(Path.cwd() / 'data' / 'Testdata', dataset_dir)
+    monkeypatch.chdir(tmp_path)
+    with DataManager(dataset_name='Test data', database_name='Testdatabase') as data_manager:
+        data_manager.load_data(DatasetType.TRAIN)
+        table_name = TABLE_NAMES[DatasetType.TRAIN]
+        for limit, offset in [(None, 0), (5, 10), (None, 10)]:
+            monkeypatch.setattr(data_manager_module, 'SQL_READER', 'connectorx')
+            connectorx_df = data_manager.read_data_from_table(table_name, limit=limit, offset=offset)
+            monkeypatch.setattr(data_manager_module, 'SQL_READER', 'sqlalchemy')
+            sqlalchemy_df = data_manager.read_data_from_table(table_name, limit=limit, offset=offset)
+            pd.testing.assert_frame_equal(connectorx_df, sqlalchemy_df)
+    # LIMIT -1 for an offset without limit is only sent through SQLAlchemy
+    assert len(connectorx_urls) == 2
+    assert connectorx_urls[0].endswith('/data/Test%20data/Testdatabase.sqlite')
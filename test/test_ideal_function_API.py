@@ -1,10 +1,15 @@
+from concurrent.futures import ThreadPoolExecutor
 import os
+import threading
+import time
+import numpy as np
 import pytest
 from fastapi.testclient import TestClient
-from starlette.status import HTTP_200_OK
-from src.application.DataManager import DatasetType
+from starlette.status import HTTP_200_OK, HTTP_404_NOT_FOUND
+from src.application.DataManager import TABLE_NAMES, DatasetType
 from src.application.Visualizer import VisualizationName
-from src.application.rest.ideal_functions_API import app
+from src.application.rest import ideal_functions_API
+from src.application.rest.ideal_functions_API import FastJSONResponse, app
 
 #Constants
 TEST_DATASET_NAME ='Testdata'
@@ -16,6 +21,13 @@ def client():
     with TestClient(app) as test_client:
         yield test_client
 
+@pytest.fixture(scope='module')
+def pipeline_ran_client(client:TestClient):
+    """Fixture running the ideal function selection and the test data mapping once through the API."""
+    client.post('/v1/ideal-functions/select')
+    client.post('/v1/test-data/map')
+    return client
+
 @pytest.mark.asyncio
 async def test_root_endpoint(client:TestClient):
     """Test the root endpoint of the API."""
@@ -23,6 +35,35 @@ async def test_root_endpoint(client:TestClient):
     assert response.status_code == HTTP_200_OK
     assert TEST_DATASET_NAME in response.text
 
+@pytest.mark.asyncio
+async def test_plotting_endpoints_run_one_at_a_time(client:TestClient, monkeypatch:pytest.MonkeyPatch):
+    """Test that concurrent selection, mapping and visualization requests run one after another on the visualization thread."""
+    lock = threading.Lock()
+    running = []
+    max_running = []
+    thread_names = []
+
+    def _pipeline_step_spy():
+        with lock:
+            running.append(1)
+            max_running.append(len(running))
+            thread_names.append(threading.current_thread().name)
+        time.sleep(0.05)
+        with lock:
+            running.pop()
+
+    for method_name in ('get_ideal_functions', 'map_test_data_to_ideal_functions', 'get_all_functions_visualized'):
+        monkeypatch.setattr(ideal_functions_API.ideal_function_manager, method_name, _pipeline_step_spy)
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        responses = list(executor.map(lambda request: client.request(*request, follow_redirects=False),
+                                      [('POST', '/v1/ideal-functions/select'), ('POST', '/v1/ideal-functions/select'),
+                                       ('POST', '/v1/test-data/map'), ('GET', '/v1/visualizations/all')]))
+    # The mapping response depends on stored results, only the selection and the redirect are checked
+    assert [responses[0].status_code, responses[1].status_code, responses[3].status_code] == [200, 200, 307]
+    assert len(thread_names) == 4
+    assert max(max_running) == 1
+    assert all(thread_name.startswith('visualization') for thread_name in thread_names)
+
 @pytest.mark.asyncio
 async def test_swagger_ui_html(client:TestClient):
     """Test the swagger UI endpoint."""
@@ -46,18 +87,26 @@ async def test_select_ideal_functions(client:TestClient):
     assert 'selected_functions' in response.json()
 
 @pytest.mark.asyncio
-async def test_map_test_data(client:TestClient):
+async def test_map_test_data(pipeline_ran_client:TestClient):
     """Test the map_test_data endpoint."""
-    response = client.post('/v1/test-data/map')
+    response = pipeline_ran_client.post('/v1/test-data/map')
     assert response.status_code == HTTP_200_OK
     assert response.json()['message'] == 'Test data mapping completed.'
     assert 'mapping_summary' in response.json()
 
 @pytest.mark.asyncio
-async def test_get_visualization(client:TestClient):
+async def test_get_visualization(pipeline_ran_client:TestClient):
     """Test the get_visualization endpoint."""
-    response = client.get(f'/v1/visualizations/{VisualizationName.initial_data.value}')
+    response = pipeline_ran_client.get(f'/v1/visualizations/{VisualizationName.initial_data.value}')
     assert response.status_code == HTTP_200_OK
+    assert response.headers['content-type'].startswith('text/html')
+    assert 'etag' in response.headers
+
+@pytest.mark.asyncio
+async def test_get_visualization_static_only_html(client:TestClient):
+    """Test that the static visualization mount does not expose the dataset's CSV and database files."""
+    response = client.get('/v1/visualizations-static/train.csv')
+    assert response.status_code == HTTP_404_NOT_FOUND
 
 @pytest.mark.asyncio
 @pytest.mark.parametrize("dataset_type", DatasetType)
@@ -65,7 +114,16 @@ async def test_get_database(client:TestClient, dataset_type):
     """Test the get_database endpoint."""
     response = client.get(f'/v1/data/database-view?dataset_type={dataset_type.value}')
     assert response.status_code == HTTP_200_OK
-    assert 'Database view with FastAPI' in response.text
+    assert f'Database view with FastAPI: {TABLE_NAMES[dataset_type]}' in response.text
+
+@pytest.mark.asyncio
+async def test_get_database_records_page(client:TestClient):
+    """Test the get_database_records endpoint with offset and limit."""
+    response = client.get(f'/v1/data/database-records?dataset_type={DatasetType.IDEAL.value}&offset=10&limit=5')
+    assert response.status_code == HTTP_200_OK
+    records = response.json()
+    assert len(records) == 5
+    assert 'x' in records[0]
     
 @pytest.mark.asyncio
 @pytest.mark.parametrize("dataset_type", DatasetType)
@@ -79,6 +137,8 @@ async def test_get_all_visualizations(client:TestClient):
     """Test the get_all_visualizations endpoint."""
     response = client.get('/v1/visualizations/all')
     assert response.status_code == HTTP_200_OK
+    assert response.url.path == f'/v1/visualizations-static/{VisualizationName.initial_data.value}.html'
+    assert response.headers['content-type'].startswith('text/html')
 
 @pytest.mark.asyncio
 async def test_get_test_mapping_results(client:TestClient):
@@ -86,3 +146,17 @@ async def test_get_test_mapping_results(client:TestClient):
     response = client.get('/v1/data/test-mapping-results')
     assert response.status_code == HTTP_200_OK
     assert 'Database view with FastAPI: Test Data Mapping' in response.text
+
+@pytest.mark.asyncio
+async def test_get_test_mapping_records(pipeline_ran_client:TestClient):
+    """Test the get_test_mapping_records endpoint."""
+    response = pipeline_ran_client.get('/v1/data/test-mapping-records?limit=3')
+    assert response.status_code == HTTP_200_OK
+    assert 0 < len(response.json()) <= 3
+
+def test_fast_json_response_numpy_and_nan():
+    """Test that FastJSONResponse serializes NumPy values and NaN through orjson."""
+    pytest.importorskip('orjson')
+    response = FastJSONResponse(content={'max_deviation': np.float64(0.5), 'index': np.int64(3),
+                                         'values': np.array([1.0, 2.0]), 'missing': float('nan')})
+    assert response.body == b'{"max_deviation":0.5,"index":3,"values":[1.0,2.0],"missing":null}'
@@ -1,20 +1,19 @@
-import shutil
 from pathlib import Path
+import shutil
 import pandas as pd
 import pytest
-from src.application.IdealFunctionsManager import IdealFunctionsManager, DatasetType
+import numpy as np
+from src.application.IdealFunctionsManager import IdealFunctionsManager, DatasetType, _fit_linear, _hash_data_frames, _map_test_points
+from src.application.Visualizer import VisualizationName
 from src.application.DataManager import DataManager
 
 
-@pytest.fixture(scope='module')
-def simulated_ideal_functions_manager():
-    """Fixture to create a simulated IdealFunctionsManager instance for testing."""
-    TEST_DATA_DIR = Path('./test/temp')
-    TEST_DATA_DIR.mkdir(parents=True, exist_ok=True)
-
-    yield IdealFunctionsManager(dataset_name='Testdata')
-
-    shutil.rmtree(str(TEST_DATA_DIR.absolute()), ignore_errors=True)
+@pytest.fixture
+def isolated_ideal_functions_manager():
+    """Fixture to create an IdealFunctionsManager with its own in-memory databases, for tests writing results."""
+    ideal_functions_manager = IdealFunctionsManager(dataset_name='Testdata', database_url='sqlite://')
+    yield ideal_functions_manager
+    ideal_functions_manager.close()
 
 @pytest.fixture(scope='module')
 def sample_data():
@@ -56,22 +55,151 @@ def test__calculate_squared_deviation_exception(simulated_ideal_functions_manage
     with pytest.raises(Exception):
         simulated_ideal_functions_manager._calculate_squared_deviation(pd.Series([1,2,3]),pd.Series([1,2]), 'invalid')
 
+def test__map_test_points():
+    """Test if _map_test_points picks the closest ideal function within its threshold."""
+    x_test = np.array([0.0, 1.0, 2.0])
+    y_test = np.array([0.1, 1.9, 10.0])
+    # Ideal functions y = x and y = 2x
+    best_indices, min_deviations = _map_test_points(x_test, y_test, np.array([0.0, 0.0]), np.array([1.0, 2.0]), np.array([0.5, 0.5]))
+    assert best_indices.tolist() == [0, 1, -1]
+    assert np.allclose(min_deviations[:2], [0.1, 0.1])
+    assert np.isinf(min_deviations[2])
+
 def test_get_all_visualizations_success(simulated_ideal_functions_manager:IdealFunctionsManager):
     """Test all functions with successful data loading and visualization."""
     simulated_ideal_functions_manager.get_all_functions_visualized()
 
-def test_get_ideal_functions_success(simulated_ideal_functions_manager:IdealFunctionsManager):
-    """Test get_ideal_functions with successful data loading and visualization."""
-    simulated_ideal_functions_manager.get_ideal_functions()
-    assert isinstance(simulated_ideal_functions_manager.ideal_functions_selection, dict)
-    assert isinstance(simulated_ideal_functions_manager.ideal_functions_data, pd.DataFrame)
-    assert len(simulated_ideal_functions_manager.ideal_functions_data.columns) > 0
+def test_get_all_visualizations_cached(tmp_path:Path, monkeypatch:pytest.MonkeyPatch):
+    """Test that the initial visualization is only regenerated when the data or the plot settings change."""
+    shutil.copytree(Path.cwd() / 'data' / 'Testdata', tmp_path / 'data' / 'Testdata',
+                    ignore=shutil.ignore_patterns('*.html', '*.sha', '*.sqlite'))
+    monkeypatch.chdir(tmp_path)
+    ideal_functions_manager = IdealFunctionsManager(dataset_name='Testdata', database_url='sqlite://')
+    try:
+        ideal_functions_manager.get_all_functions_visualized()
+        visualization_file_path = tmp_path / 'data' / 'Testdata' / f'{VisualizationName.initial_data.value}.html'
+        hash_file_path = visualization_file_path.with_name(f'{visualization_file_path.name}.sha')
+        modified_time = visualization_file_path.stat().st_mtime_ns
+        data_hash = hash_file_path.read_text()
+        ideal_functions_manager.get_all_functions_visualized()
+        assert visualization_file_path.stat().st_mtime_ns == modified_time
+
+        monkeypatch.setattr('src.application.IdealFunctionsManager.MAX_POINTS_PER_SERIES', 10)
+        ideal_functions_manager.get_all_functions_visualized()
+        assert hash_file_path.read_text() != data_hash
+    finally:
+        ideal_functions_manager.close()
+
+def test__fit_linear():
+    """Test _fit_linear for one and several functions and for constant x."""
+    x = np.array([0.0, 1.0, 2.0, 3.0])
+    intercept, slope = _fit_linear(x, 2 * x + 1)
+    assert np.isclose(intercept, 1.0) and np.isclose(slope, 2.0)
+    intercepts, slopes = _fit_linear(x, np.column_stack([2 * x + 1, -x]))
+    assert np.allclose(intercepts, [1.0, 0.0]) and np.allclose(slopes, [2.0, -1.0])
+    # Constant x has no slope, the intercept is the mean of y
+    intercepts, slopes = _fit_linear(np.full(3, 2.0), np.array([[1.0, 4.0], [2.0, 5.0], [3.0, 6.0]]))
+    assert np.allclose(intercepts, [2.0, 5.0]) and np.allclose(slopes, [0.0, 0.0])
+
+def test__hash_data_frames(sample_data):
+    """Test that _hash_data_frames changes with the values and the column names."""
+    data_hash = _hash_data_frames(sample_data)
+    assert data_hash == _hash_data_frames(sample_data.copy())
+    assert data_hash != _hash_data_frames(sample_data.assign(y=0))
+    assert data_hash != _hash_data_frames(sample_data.rename(columns={'y': 'z'}))
+    assert data_hash != _hash_data_frames(sample_data, title='Plot')
+    assert _hash_data_frames(sample_data, title='Plot') != _hash_data_frames(sample_data, title='Other plot')
 
-def test__store_results_success(simulated_ideal_functions_manager:IdealFunctionsManager, sample_data:pd.DataFrame):
+def test__store_results_success(isolated_ideal_functions_manager:IdealFunctionsManager, sample_data:pd.DataFrame):
     """Test if _store_results stores results correctly."""
-    simulated_ideal_functions_manager._store_results(sample_data)
+    isolated_ideal_functions_manager._store_results(sample_data)
+    stored_results = isolated_ideal_functions_manager.results_db.read_data_from_table(table_name='TestDataMapping')
+    pd.testing.assert_frame_equal(stored_results, sample_data)
 
-def test_map_test_data_to_ideal_functions_success(simulated_ideal_functions_manager:IdealFunctionsManager):
+def test_get_ideal_functions_success(pipeline_ran:IdealFunctionsManager):
+    """Test get_ideal_functions with successful data loading and visualization."""
+    assert isinstance(pipeline_ran.ideal_functions_selection, dict)
+    assert isinstance(pipeline_ran.ideal_functions_data, pd.DataFrame)
+    assert len(pipeline_ran.ideal_functions_data.columns) > 0
+    # Selection and max deviations of the original per column regression on Testdata
+    assert pipeline_ran.ideal_functions_selection == {'y1': 'y42', 'y2': 'y41', 'y3': 'y11', 'y4': 'y48'}
+    assert pipeline_ran.training_data_max_deviations == pytest.approx(
+        {'y1': 0.971858273018217, 'y2': 0.9716727840310764, 'y3': 0.498936, 'y4': 0.7556059225090567}, rel=1e-9)
+
+def test_map_test_data_to_ideal_functions_success(pipeline_ran:IdealFunctionsManager):
     """Test map_test_data_to_ideal_functions successfully.""" 
-    simulated_ideal_functions_manager.get_ideal_functions()
-    simulated_ideal_functions_manager.map_test_data_to_ideal_functions()
\ No newline at end of file
+    mapping_results = pipeline_ran.results_db.read_data_from_table(table_name='TestDataMapping')
+    assert not mapping_results.empty
+    assert 'No. of ideal func' in mapping_results.columns
+    # Number of test points the original implementation mapped on Testdata
+    assert len(mapping_results) == 65
+    assert set(mapping_results['No. of ideal func']) <= {'y42', 'y41', 'y11', 'y48'}
+
+def test_map_test_data_fits_on_ideal_x(tmp_path:Path, monkeypatch:pytest.MonkeyPatch):
+    """Test that the selection fits the chosen ideal functions on the ideal data's x and the mapping uses them."""
+    dataset_path = tmp_path / 'data' / 'Fitdata'
+    dataset_path.mkdir(parents=True)
+    x = np.arange(5, dtype=float)
+    pd.DataFrame({'x': x, 'y1': 2 * x + 1}).to_csv(dataset_path / 'train.csv', index=False)
+    # Same ideal function on a shifted x grid, fitted against the training x it would be y = 2x + 21
+    pd.DataFrame({'x': x + 10, 'y1': 2 * (x + 10) + 1}).to_csv(dataset_path / 'ideal.csv', index=False)
+    pd.DataFrame({'x': [3.0], 'y': [7.0]}).to_csv(dataset_path / 'test.csv', index=False)
+    monkeypatch.chdir(tmp_path)
+    ideal_functions_manager = IdealFunctionsManager(dataset_name='Fitdata', database_url='sqlite://')
+    try:
+        ideal_functions_manager.get_ideal_functions()
+        assert ideal_functions_manager.ideal_func_coeffs['y1'] == pytest.approx((1.0, 2.0))
+
+        # The mapping reads the stored coefficients instead of fitting again
+        ideal_functions_manager.ideal_func_coeffs['y1'] = (0.5, 2.0)
+        ideal_functions_manager.map_test_data_to_ideal_functions()
+        mapping_results = ideal_functions_manager.results_db.read_data_from_table(table_name='TestDataMapping')
+        assert mapping_results['No. of ideal func'].tolist() == ['y1']
+        assert mapping_results['Delta Y'].tolist() == pytest.approx([0.5])
+    finally:
+        ideal_functions_manager.close()
+
+def test_get_ideal_functions_missing_values(tmp_path:Path, monkeypatch:pytest.MonkeyPatch):
+    """Test that a missing ideal value excludes that ideal function and missing training values are skipped."""
+    dataset_path = tmp_path / 'data' / 'Testdata'
+    dataset_path.mkdir(parents=True)
+    for dataset_type in DatasetType:
+        shutil.copy(Path.cwd() / 'data' / 'Testdata' / f'{dataset_type.value}.csv', dataset_path)
+    ideal_data = pd.read_csv(dataset_path / 'ideal.csv')
+    ideal_data.loc[5, 'y1'] = np.nan
+    ideal_data.to_csv(dataset_path / 'ideal.csv', index=False)
+    train_data = pd.read_csv(dataset_path / 'train.csv')
+    train_data.loc[5, 'y2'] = np.nan
+    train_data.to_csv(dataset_path / 'train.csv', index=False)
+    monkeypatch.chdir(tmp_path)
+    ideal_functions_manager = IdealFunctionsManager(dataset_name='Testdata', database_url='sqlite://')
+    try:
+        ideal_functions_manager.get_ideal_functions()
+        assert ideal_functions_manager.ideal_functions_selection == {'y1': 'y42', 'y2': 'y41', 'y3': 'y11', 'y4': 'y48'}
+        assert np.isfinite(list(ideal_functions_manager.training_data_max_deviations.values())).all()
+    finally:
+        ideal_functions_manager.close()
+
+def test_get_ideal_functions_parallel(monkeypatch, pipeline_ran:IdealFunctionsManager,
+                                     isolated_ideal_functions_manager:IdealFunctionsManager):
+    """Test that the threaded deviation search over ideal function blocks selects the same functions as the serial one."""
+    import src.application.IdealFunctionsManager as ideal_functions_module
+    deviation_matrix = ideal_functions_module._deviation_matrix
+    deviation_matrix_calls = []
+
+    def _deviation_matrix_spy(y_train, y_predicted_ideal):
+        deviation_matrix_calls.append(y_predicted_ideal.shape[1])
+        return deviation_matrix(y_train, y_predicted_ideal)
+
+    monkeypatch.setattr(ideal_functions_module, '_deviation_matrix', _deviation_matrix_spy)
+    monkeypatch.setattr(ideal_functions_module, 'PARALLEL_MIN_ELEMENTS', 0)
+    monkeypatch.setattr(ideal_functions_module.os, 'cpu_count', lambda: 4)
+
+    parallel_manager = isolated_ideal_functions_manager
+    parallel_manager.get_ideal_functions()
+
+    # One block of ideal functions per worker
+    assert len(deviation_matrix_calls) == 4
+    assert sum(deviation_matrix_calls) == len(pipeline_ran.data_manager.load_data_frame(DatasetType.IDEAL).columns) - 1
+    assert parallel_manager.ideal_functions_selection == pipeline_ran.ideal_functions_selection
+    assert parallel_manager.training_data_max_deviations == pytest.approx(pipeline_ran.training_data_max_deviations)
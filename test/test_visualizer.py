@@ -1,22 +1,20 @@
-import shutil
+import math
 import pytest
 from pathlib import Path
 import pandas as pd
-from bokeh.plotting import figure
-from bokeh.models import Legend
 from src.application.Visualizer import Visualizer
 
-TEST_DATA_DIR = Path('./test/temp')
-
 @pytest.fixture(scope='module')
 def visualizer():
     """Fixture to create a Visualizer instance."""
-    
-    TEST_DATA_DIR.mkdir(parents=True, exist_ok=True)
+    pytest.importorskip('bokeh')
+    return Visualizer()
 
-    yield Visualizer()
 
-    shutil.rmtree(str(TEST_DATA_DIR.absolute()), ignore_errors=True)
+@pytest.fixture(scope='module')
+def output_dir(tmp_path_factory) -> Path:
+    """Fixture to create a temporary directory for the plot files, removed by pytest."""
+    return tmp_path_factory.mktemp('viz')
 
 
 @pytest.fixture(scope='module')
@@ -31,6 +29,8 @@ def sample_data():
 
 def test_configure_legend_layout(visualizer:Visualizer):
     """Test the configure_legend_layout method."""
+    from bokeh.models import Legend
+    from bokeh.plotting import figure
     plot = figure()
     legend = Legend()
     visualizer._configure_legend_layout(legend, plot)
@@ -41,19 +41,20 @@ def test_configure_legend_layout(visualizer:Visualizer):
     assert legend.label_text_font_size == '12px'
 
 
-def test_save_plot(visualizer:Visualizer):
+def test_save_plot(visualizer:Visualizer, output_dir:Path):
     """Test the save_plot method."""
+    from bokeh.plotting import figure
     plot = figure()
-    test_filename = TEST_DATA_DIR / 'test_plot.html'
+    test_filename = output_dir / 'test_plot.html'
     visualizer._save_plot(plot, test_filename)
 
     assert test_filename.exists()
     test_filename.unlink()
 
 
-def test_create_combined_plot(visualizer:Visualizer, sample_data):
+def test_create_combined_plot(visualizer:Visualizer, output_dir:Path, sample_data):
     """Test the create_combined_plot method."""
-    test_filename = TEST_DATA_DIR / 'test_combined_plot.html'
+    test_filename = output_dir / 'test_combined_plot.html'
     visualizer.create_combined_plot(
         dataframes=[sample_data, sample_data],
         dataframe_names=['Data1', 'Data2'],
@@ -66,9 +67,9 @@ def test_create_combined_plot(visualizer:Visualizer, sample_data):
     assert test_filename.exists()
     test_filename.unlink()
     
-def test_create_combined_plot_with_missing_y_columns(visualizer:Visualizer, sample_data):
+def test_create_combined_plot_with_missing_y_columns(visualizer:Visualizer, output_dir:Path, sample_data):
     """Test create_combined_plot when some specified y_cols are not in the DataFrames."""
-    test_filename = TEST_DATA_DIR / 'test_combined_plot_missing_y.html'
+    test_filename = output_dir / 'test_combined_plot_missing_y.html'
     visualizer.create_combined_plot(
         dataframes=[sample_data],
         dataframe_names=['Data1'],
@@ -81,9 +82,41 @@ def test_create_combined_plot_with_missing_y_columns(visualizer:Visualizer, samp
     assert test_filename.exists()
     test_filename.unlink()
 
-def test_create_combined_plot_empty_dataframes(visualizer:Visualizer):
+def test_create_combined_plot_downsampled(visualizer:Visualizer, output_dir:Path, monkeypatch):
+    """Test create_combined_plot thins a dataframe exceeding max_points_per_series to every n-th row."""
+    import bokeh.models
+    column_data_source = bokeh.models.ColumnDataSource
+    sources = []
+
+    def _column_data_source_spy(*args, **kwargs):
+        source = column_data_source(*args, **kwargs)
+        sources.append(source)
+        return source
+
+    monkeypatch.setattr(bokeh.models, 'ColumnDataSource', _column_data_source_spy)
+    data = pd.DataFrame({'x': range(101), 'y1': range(101), 'y2': range(101)})
+    test_filename = output_dir / 'test_combined_plot_downsampled.html'
+    visualizer.create_combined_plot(
+        dataframes=[data],
+        dataframe_names=['Data1'],
+        x_col='x',
+        y_cols=['y1', 'y2'],
+        title='Test Combined Plot Downsampled',
+        filename=test_filename,
+        max_points_per_series=20
+    )
+
+    assert test_filename.exists()
+    # Stride ceil(101 / 20) = 6 keeps rows 0, 6, ..., 96, i.e. ceil(101 / 6) = 17 points
+    stride = math.ceil(len(data) / 20)
+    assert len(sources) == 1
+    assert sources[0].data['x'].tolist() == list(range(0, 101, stride))
+    assert len(sources[0].data['y1']) == math.ceil(len(data) / stride) == 17
+    test_filename.unlink()
+
+def test_create_combined_plot_empty_dataframes(visualizer:Visualizer, output_dir:Path):
     """Test create_combined_plot with empty dataframe."""
-    test_filename = TEST_DATA_DIR / 'test_combined_plot_empty.html'
+    test_filename = output_dir / 'test_combined_plot_empty.html'
     visualizer.create_combined_plot(
         dataframes=[],
         dataframe_names=[],